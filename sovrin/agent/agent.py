@@ -1,8 +1,13 @@
 import asyncio
 import uuid
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime
+from typing import Any
 from typing import Dict
+from typing import List
 from typing import Tuple
 
 import asyncio
@@ -24,8 +29,7 @@ from plenum.common.motor import Motor
 from plenum.common.startable import Status
 from plenum.common.txn import TYPE, DATA, IDENTIFIER, NONCE, NAME, VERSION
 from plenum.common.types import f
-from plenum.common.util import getCryptonym, isHex, cryptonymToHex, \
-    randomString
+from plenum.common.util import getCryptonym, randomString
 from sovrin.agent.agent_net import AgentNet
 from sovrin.agent.msg_types import AVAIL_CLAIM_LIST, CLAIMS, REQUEST_CLAIM, \
     ACCEPT_INVITE, REQUEST_CLAIM_ATTRS, CLAIM_ATTRS
@@ -35,7 +39,7 @@ from sovrin.client.wallet.claim import ClaimDef, ClaimDefKey
 from sovrin.client.wallet.link import Link, constant
 from sovrin.client.wallet.wallet import Wallet
 from sovrin.common.txn import ATTR_NAMES
-from sovrin.common.util import verifySig, getConfig
+from sovrin.common.util import verifySig, verifySigBatch, getConfig
 
 ALREADY_ACCEPTED_FIELD = 'alreadyAccepted'
 CLAIMS_LIST_FIELD = 'availableClaimsList'
@@ -49,6 +53,13 @@ EVENT_NAME = "eventName"
 EVENT_NOTIFY_MSG = "NOTIFY"
 EVENT_POST_ACCEPT_INVITE = "POST_ACCEPT_INVITE_EVENT"
 
+# resolved once, these are read for nearly every message
+_SIG_NM = f.SIG.nm
+_ID_NM = f.IDENTIFIER.nm
+
+# responses keep coming from the same few identifiers
+_cryptonym = lru_cache(maxsize=1024)(getCryptonym)
+
 logger = getlogger()
 
 
@@ -59,10 +70,15 @@ class Agent(Motor, AgentNet):
                  client: Client=None,
                  port: int=None):
         Motor.__init__(self)
-        self._observers = set()
+        self._observers = []        # type: List[Any]
         self._eventListeners = {}   # Dict[str, set(Callable)]
         self._name = name
 
+        # uids of the remotes messages were sent to by ha alone, which the
+        # endpoint resolves by going through all its remotes. Remotes are
+        # mutable, so an entry is checked against the endpoint before use
+        self._remoteUidByHa = {}    # type: Dict[Tuple, int]
+
         AgentNet.__init__(self,
                           name=self._name.replace(" ", ""),
                           port=port,
@@ -131,12 +147,30 @@ class Agent(Motor, AgentNet):
         raise NotImplementedError
 
     def sendMessage(self, msg, destName: str=None, destHa: Tuple=None):
-        try:
-            remote = self.endpoint.getRemote(name=destName, ha=destHa)
-        except RemoteNotFound as ex:
-            fault(ex, "Do not know {} {}".format(destName, destHa))
-            return
-        self.endpoint.transmit(msg, remote.uid)
+        uid = None
+        if destName is None:
+            # a cached uid still costs a check against the endpoint's remotes
+            uid = self._remoteUidByHa.get(destHa)
+            if uid is not None and not self._isRemoteAt(uid, destHa):
+                uid = None
+        if uid is None:
+            try:
+                uid = self.endpoint.getRemote(name=destName, ha=destHa).uid
+            except RemoteNotFound as ex:
+                fault(ex, "Do not know {} {}".format(destName, destHa))
+                return
+            if destName is None:
+                self._remoteUidByHa[destHa] = uid
+        self.endpoint.transmit(msg, uid)
+
+    def _isRemoteAt(self, uid, ha: Tuple) -> bool:
+        """
+        Whether the endpoint still has a remote with this uid at this ha. The
+        stack is mutable, so a remote can rejoin with a new uid or move to a
+        new ha.
+        """
+        remote = self.endpoint.remotes.get(uid)
+        return remote is not None and tuple(remote.ha) == tuple(ha)
 
     def connectTo(self, ha):
         self.endpoint.connectTo(ha)
@@ -154,10 +188,15 @@ class Agent(Motor, AgentNet):
             self._eventListeners[eventName] = cur - set(listener)
 
     def registerObserver(self, observer):
-        self._observers.add(observer)
+        if observer not in self._observers:
+            self._observers.append(observer)
 
     def deregisterObserver(self, observer):
-        self._observers.remove(observer)
+        try:
+            self._observers.remove(observer)
+        except ValueError:
+            # same error as when observers were kept in a set
+            raise KeyError(observer)
 
 
 class WalletedAgent(Agent):
@@ -169,6 +208,23 @@ class WalletedAgent(Agent):
     case, the agent holds a wallet.
     """
 
+    # Names of the methods handling each message type. Shared by all instances;
+    # subclasses handling more types should extend a copy of it.
+    _MSG_HANDLER_NAMES = {
+        ERROR: '_handleError',
+        AVAIL_CLAIM_LIST: '_handleAcceptInviteResponse',
+        CLAIMS: '_handleReqClaimResponse',
+        ACCEPT_INVITE: '_acceptInvite',
+        REQUEST_CLAIM_ATTRS: '_returnClaimAttrs',
+        REQUEST_CLAIM: '_reqClaim',
+        CLAIM_ATTRS: '_handleClaimAttrs',
+        EVENT: '_eventHandler'
+    }
+
+    # types whose handlers verify the sender's signature
+    _SIGNED_MSG_TYPES = {AVAIL_CLAIM_LIST, CLAIMS, ACCEPT_INVITE,
+                         REQUEST_CLAIM_ATTRS, CLAIM_ATTRS, EVENT}
+
     def __init__(self,
                  name: str,
                  basedirpath: str,
@@ -184,16 +240,33 @@ class WalletedAgent(Agent):
         prepared = self._wallet.preparePending()
         self.client.submitReqs(*prepared)
         self.loop = asyncio.get_event_loop()
-        self.msgHandlers = {
-            ERROR: self._handleError,
-            AVAIL_CLAIM_LIST: self._handleAcceptInviteResponse,
-            CLAIMS: self._handleReqClaimResponse,
-            ACCEPT_INVITE: self._acceptInvite,
-            REQUEST_CLAIM_ATTRS: self._returnClaimAttrs,
-            REQUEST_CLAIM: self._reqClaim,
-            CLAIM_ATTRS: self._handleClaimAttrs,
-            EVENT: self._eventHandler
-        }
+        self.config = getConfig()
+        # messages received from the endpoint, handled in `prod`
+        self._receivedMsgs = deque()
+        # verification results for the messages being handled, by message id,
+        # when they were verified ahead of time on worker threads
+        self._preVerified = {}      # type: Dict[int, bool]
+        # created when the first batch large enough to need it arrives
+        self._verifyExecutor = None
+        # signed requests waiting to be submitted to Sovrin, along with the
+        # callback to run once each is completed
+        self._sovrinQueue = deque()
+
+        self._linkByTargetCache = {}    # type: Dict[str, Link]
+
+    async def prod(self, limit) -> int:
+        c = await super().prod(limit)
+        c += await self._handleReceivedMsgs()
+        c += self._submitQueuedToSovrin()
+        return c
+
+    def onStopping(self, *args, **kwargs):
+        super().onStopping(*args, **kwargs)
+        if self._verifyExecutor:
+            # does not wait for, or cancel, a batch being verified; its
+            # results are still handed to the handlers
+            self._verifyExecutor.shutdown(wait=False)
+            self._verifyExecutor = None
 
     @property
     def wallet(self):
@@ -218,46 +291,60 @@ class WalletedAgent(Agent):
         }
         return invalidSigResp
 
-    def logAndSendErrorResp(self, to, reqBody, respMsg, logMsg):
-        logger.warning(logMsg)
+    def logAndSendErrorResp(self, to, reqBody, respMsg, logMsg, *logArgs):
+        # `logMsg` is %-formatted with `logArgs` only if the warning is emitted
+        logger.warning(logMsg, *logArgs)
         self.signAndSendToCaller(resp=self.getErrorResponse(reqBody, respMsg),
                                  identifier=self.wallet.defaultId, frm=to)
 
+    def _verifyBody(self, body) -> bool:
+        verified = self._preVerified.get(id(body))
+        if verified is None:
+            # The signature field is left out of the signed serialization,
+            # so the message is verified as received
+            verified = verifySig(body.get(IDENTIFIER), body.get(_SIG_NM), body)
+        return verified
+
     def verifyAndGetLink(self, msg):
         body, (frm, ha) = msg
-        key = body.get(f.IDENTIFIER.nm)
-        signature = body.get(f.SIG.nm)
-        verified = verifySig(key, signature, body)
+        key = body.get(_ID_NM)
+        verified = self._verifyBody(body)
 
         nonce = body.get(NONCE)
         matchingLink = self.wallet.getLinkByNonce(nonce)
 
         if not verified:
             self.logAndSendErrorResp(frm, body, "Signature Rejected",
-                                     "Signature verification failed for msg: {}"
-                                     .format(str(msg)))
+                                     "Signature verification failed for "
+                                     "msg: %s", msg)
             return None
 
         if not matchingLink:
             self.logAndSendErrorResp(frm, body, "No Such Link found",
-                                     "Link not found for msg: {}".format(msg))
+                                     "Link not found for msg: %s", msg)
             return None
 
-        matchingLink.remoteIdentifier = body.get(f.IDENTIFIER.nm)
+        matchingLink.remoteIdentifier = key
         matchingLink.remoteEndPoint = ha
         return matchingLink
 
     def signAndSendToCaller(self, resp, identifier, frm):
         resp[IDENTIFIER] = identifier
         signature = self.wallet.signMsg(resp, identifier)
-        resp[f.SIG.nm] = signature
+        resp[_SIG_NM] = signature
         self.sendMessage(resp, destName=frm)
 
     @staticmethod
     def getCommonMsg(typ, data):
+        # The identifier and signature slots are filled in by
+        # `signAndSendToCaller`; creating them here lets it overwrite existing
+        # keys instead of inserting new ones. The signature field is not part
+        # of the signed serialization.
         msg = {
             TYPE: typ,
-            DATA: data
+            DATA: data,
+            IDENTIFIER: None,
+            _SIG_NM: None
         }
         return msg
 
@@ -297,16 +384,89 @@ class WalletedAgent(Agent):
         for o in self._observers:
             o.notify(self, msg)
 
+    def notifyObserversBatch(self, msgs: List[str]):
+        """
+        Notifies observers of several messages at once. Observers may define
+        `notifyBatch(notifier, msgs)`; the others get a `notify` per message.
+        """
+        for o in self._observers:
+            notifyBatch = getattr(o, 'notifyBatch', None)
+            if notifyBatch:
+                notifyBatch(self, msgs)
+            else:
+                for msg in msgs:
+                    o.notify(self, msg)
+
     def notifyEventListeners(self, eventName, **args):
         for el in self._eventListeners[eventName]:
             el(**args)
 
     def handleEndpointMessage(self, msg):
+        self._receivedMsgs.append(msg)
+
+    async def _handleReceivedMsgs(self) -> int:
+        """
+        Handles the messages received from the endpoint since the last call.
+        Large batches have their signatures verified on worker threads first.
+        Messages are taken off the queue one at a time, so when a handler
+        raises, the messages after it are left for the next call.
+        """
+        if not self._receivedMsgs:
+            return 0
+        if len(self._receivedMsgs) >= \
+                self.config.AgentVerifyInExecutorMinBatch:
+            await self._verifyInExecutor(
+                [body for body, _ in self._receivedMsgs])
+        c = 0
+        try:
+            while self._receivedMsgs:
+                self._dispatch(self._receivedMsgs.popleft())
+                c += 1
+        finally:
+            self._preVerified.clear()
+        return c
+
+    async def _verifyInExecutor(self, bodies):
+        """
+        Verifies the signatures of the messages on worker threads so the event
+        loop keeps servicing the network meanwhile; libnacl releases the GIL
+        while verifying. Results are left in `_preVerified` for the handlers.
+        A chunk that fails to verify leaves its messages to be verified, and
+        their errors reported, by their handlers.
+        """
+        if self.get_status() in (Status.stopping, Status.stopped):
+            return
+        signed = [body for body in bodies
+                  if body.get(TYPE) in self._SIGNED_MSG_TYPES and
+                  body.get(IDENTIFIER) and body.get(_SIG_NM)]
+        if not signed:
+            return
+        if self._verifyExecutor is None:
+            self._verifyExecutor = ThreadPoolExecutor(
+                max_workers=self.config.AgentVerifyWorkers)
+        # Every chunk is submitted before the first await, so `onStopping`
+        # cannot shut the executor down in between. Shutting it down later
+        # lets the submitted chunks finish.
+        executor = self._verifyExecutor
+        chunkSize = self.config.AgentVerifyInExecutorChunkSize
+        chunks = [signed[i:i + chunkSize]
+                  for i in range(0, len(signed), chunkSize)]
+        futures = [self.loop.run_in_executor(
+            executor, verifySigBatch,
+            [(body[IDENTIFIER], body[_SIG_NM], body) for body in chunk])
+            for chunk in chunks]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for chunk, verified in zip(chunks, results):
+            if not isinstance(verified, Exception):
+                for body, v in zip(chunk, verified):
+                    self._preVerified[id(body)] = v
+
+    def _dispatch(self, msg):
         body, frm = msg
-        handler = self.msgHandlers.get(body.get(TYPE))
-        if handler:
+        name = type(self)._MSG_HANDLER_NAMES.get(body.get(TYPE))
+        if name:
             frmHa = self.endpoint.getRemote(frm).ha
-            handler((body, (frm, frmHa)))
+            getattr(self, name)((body, (frm, frmHa)))
         else:
             raise NotImplementedError
             # logger.warning("no handler found for type {}".format(typ))
@@ -321,25 +481,25 @@ class WalletedAgent(Agent):
         isVerified = self._isVerified(body)
         if isVerified:
             identifier = body.get(IDENTIFIER)
-            li = self._getLinkByTarget(getCryptonym(identifier))
+            li = self._getLinkByTarget(_cryptonym(identifier))
             if li:
                 # TODO: Show seconds took to respond
-                self.notifyObservers("Response from {}:".format(li.name))
-                self.notifyObservers("    Signature accepted.")
-                self.notifyObservers("    Trust established.")
                 alreadyAccepted = body[DATA].get(ALREADY_ACCEPTED_FIELD)
-                if alreadyAccepted:
-                    self.notifyObservers("    Already accepted.")
-                else:
-                    self.notifyObservers("    Identifier created in Sovrin.")
-                availableClaims = []
-                for cl in body[DATA][CLAIMS_LIST_FIELD]:
-                    name, version, claimDefSeqNo = cl[NAME], cl[VERSION], \
-                                                   cl['claimDefSeqNo']
-                    claimDefKey = ClaimDefKey(name, version, claimDefSeqNo,
-                                              li.remoteIdentifier)
-                    availableClaims.append(AvailableClaimData(claimDefKey))
-
+                self.notifyObserversBatch([
+                    "Response from {}:".format(li.name),
+                    "    Signature accepted.",
+                    "    Trust established.",
+                    "    Already accepted." if alreadyAccepted else
+                    "    Identifier created in Sovrin."
+                ])
+                claimsList = body[DATA][CLAIMS_LIST_FIELD]
+                author = li.remoteIdentifier
+                claimDefKeys = [ClaimDefKey(cl[NAME], cl[VERSION],
+                                            cl['claimDefSeqNo'], author)
+                                for cl in claimsList]
+                availableClaims = [AvailableClaimData(claimDefKey)
+                                   for claimDefKey in claimDefKeys]
+                for cl, claimDefKey in zip(claimsList, claimDefKeys):
                     if cl.get('definition', None):
                         self.wallet.addClaimDef(
                             ClaimDef(claimDefKey, cl['definition']))
@@ -377,40 +537,51 @@ class WalletedAgent(Agent):
             claim = body[DATA][CLAIMS_FIELD]
             # for claim in body[CLAIMS_FIELD]:
             self.notifyObservers("Received {}.".format(claim[NAME]))
-            li = self._getLinkByTarget(getCryptonym(identifier))
+            li = self._getLinkByTarget(_cryptonym(identifier))
             if li:
-                name, version, claimDefSeqNo, idr = \
-                    claim[NAME], claim[VERSION], \
-                    claim['claimDefSeqNo'], claim[f.IDENTIFIER.nm]
-                issuerKeys = {}  # TODO: Need to decide how/where to get it
-                attributes = claim['attributes']  # TODO: Need to finalize this
-                rc = ReceivedClaim(
-                    ClaimDefKey(name, version, claimDefSeqNo, idr),
-                    issuerKeys,
-                    attributes)
-                rc.dateOfIssue = datetime.now()
-                li.updateReceivedClaims([rc])
-                self.wallet.addLinkInvitation(li)
+                self._storeReceivedClaims(li, [claim])
             else:
                 self.notifyObservers("No matching link found")
 
+    def _storeReceivedClaims(self, li: Link, claims):
+        # One timestamp for every claim received in the same response
+        now = datetime.now()
+        receivedClaims = []
+        for claim in claims:
+            name, version, claimDefSeqNo, idr = \
+                claim[NAME], claim[VERSION], \
+                claim['claimDefSeqNo'], claim[_ID_NM]
+            issuerKeys = {}  # TODO: Need to decide how/where to get it
+            attributes = claim['attributes']  # TODO: Need to finalize this
+            rc = ReceivedClaim(
+                ClaimDefKey(name, version, claimDefSeqNo, idr),
+                issuerKeys,
+                attributes)
+            rc.dateOfIssue = now
+            receivedClaims.append(rc)
+        li.updateReceivedClaims(receivedClaims)
+        self.wallet.addLinkInvitation(li)
+
     def _isVerified(self, msg: Dict[str, str]):
-        signature = msg.get(f.SIG.nm)
-        identifier = msg.get(IDENTIFIER)
-        msgWithoutSig = {}
-        for k, v in msg.items():
-            if k != f.SIG.nm:
-                msgWithoutSig[k] = v
-
-        key = cryptonymToHex(identifier) if not isHex(
-            identifier) else identifier
-        isVerified = verifySig(key, signature, msgWithoutSig)
+        isVerified = self._verifyBody(msg)
         if not isVerified:
             self.notifyObservers("Signature rejected")
         return isVerified
 
     def _getLinkByTarget(self, target) -> Link:
-        return self.wallet.getLinkInvitationByTarget(target)
+        # A cached link is used only if it is still in the wallet and still
+        # points at the target; links are mutable so anything else falls
+        # back to scanning the wallet.
+        li = self._linkByTargetCache.get(target)
+        if li is not None and li.remoteIdentifier == target and \
+                self.wallet.getLinkInvitation(li.name) is li:
+            return li
+        li = self.wallet.getLinkInvitationByTarget(target)
+        if li is not None:
+            self._linkByTargetCache[target] = li
+        else:
+            self._linkByTargetCache.pop(target, None)
+        return li
 
     def _syncLinkPostAvailableClaimsRcvd(self, li, availableClaims):
         self._checkIfLinkIdentifierWrittenToSovrin(li, availableClaims)
@@ -443,20 +614,9 @@ class WalletedAgent(Agent):
             claim = body[DATA]
             # for claim in body[CLAIMS_FIELD]:
             self.notifyObservers("Received {}.".format(claim[NAME]))
-            li = self._getLinkByTarget(getCryptonym(identifier))
+            li = self._getLinkByTarget(_cryptonym(identifier))
             if li:
-                name, version, claimDefSeqNo, idr = \
-                    claim[NAME], claim[VERSION], \
-                    claim['claimDefSeqNo'], claim[f.IDENTIFIER.nm]
-                issuerKeys = {}  # TODO: Need to decide how/where to get it
-                attributes = claim['attributes']  # TODO: Need to finalize this
-                rc = ReceivedClaim(
-                    ClaimDefKey(name, version, claimDefSeqNo, idr),
-                    issuerKeys,
-                    attributes)
-                rc.dateOfIssue = datetime.now()
-                li.updateReceivedClaims([rc])
-                self.wallet.addLinkInvitation(li)
+                self._storeReceivedClaims(li, [claim])
             else:
                 self.notifyObservers("No matching link found")
 
@@ -473,7 +633,7 @@ class WalletedAgent(Agent):
                 VERSION: claimDef.version,
                 'attributes': attributes,
                 'claimDefSeqNo': claimDefSeqNo,
-                f.IDENTIFIER.nm: claimDef.origin
+                _ID_NM: claimDef.origin
             }
             # # TODO: Need to have u value from alice and generate credential
 
@@ -494,7 +654,7 @@ class WalletedAgent(Agent):
         body, (frm, ha) = msg
         link = self.verifyAndGetLink(msg)
         if link:
-            identifier = body.get(f.IDENTIFIER.nm)
+            identifier = body.get(_ID_NM)
             idy = Identity(identifier)
             try:
                 pendingCount = self.wallet.addSponsoredIdentity(idy)
@@ -531,8 +691,19 @@ class WalletedAgent(Agent):
         #     raise NotImplementedError
 
     def _sendToSovrinAndDo(self, req, clbk=None, *args):
-        self.client.submitReqs(req)
-        ensureReqCompleted(self.loop, req.reqId, self.client, clbk, *args)
+        # Submitted on the next `prod`, together with any other requests
+        # queued by then, so the handler does not wait on the client
+        self._sovrinQueue.append((req, clbk, args))
+
+    def _submitQueuedToSovrin(self) -> int:
+        if not self._sovrinQueue:
+            return 0
+        queued = list(self._sovrinQueue)
+        self._sovrinQueue.clear()
+        self.client.submitReqs(*(req for req, _, _ in queued))
+        for req, clbk, args in queued:
+            ensureReqCompleted(self.loop, req.reqId, self.client, clbk, *args)
+        return len(queued)
 
     def _getClaimsAttrsFor(self, nonce, attrNames):
         res = {}
@@ -1631,6 +1631,9 @@ class SovrinCli(PlenumCli):
     def notify(self, notifier, msg):
         self.print(msg)
 
+    def notifyBatch(self, notifier, msgs):
+        self.print("\n".join(msgs))
+
     @property
     def canMakeSovrinRequest(self):
         if not self.hasAnyKey:
@@ -34,6 +34,8 @@ class ClaimRequest:
 
 
 class ClaimDefKey:
+    __slots__ = ('name', 'version', 'claimDefSeqNo', 'author')
+
     # TODO: Create a key property for ClaimDefKey
     def __init__(self, name, version, claimDefSeqNo, author):
         self.name = name
@@ -48,6 +50,8 @@ class ClaimDefKey:
 
 
 class AvailableClaimData:
+    __slots__ = ('claimDefKey',)
+
     def __init__(self, claimDefKey: ClaimDefKey):
         self.claimDefKey = claimDefKey
 
@@ -87,6 +91,7 @@ class ClaimDef:
 
 
 class ReceivedClaim:
+    __slots__ = ('defKey', 'issuerKeys', 'values', 'dateOfIssue')
 
     def __init__(self, defKey: ClaimDefKey, issuerKeys, values):
         self.defKey = defKey
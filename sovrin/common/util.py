@@ -6,7 +6,11 @@ import importlib
 import importlib.util
 import json
 import os
-from typing import Tuple, Union
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha256
+from threading import Lock
+from typing import Tuple, Union, List, Sequence, Dict
 
 import libnacl.secret
 from plenum.common.signing import serializeForSig
@@ -18,22 +22,74 @@ from raet.nacling import Verifier
 
 
 def getMsgWithoutSig(msg, sigFieldName=f.SIG.nm):
-    msgWithoutSig = {}
-    for k, v in msg.items():
-        if k != sigFieldName:
-            msgWithoutSig[k] = v
+    msgWithoutSig = msg.copy()
+    msgWithoutSig.pop(sigFieldName, None)
     return msgWithoutSig
 
-def verifySig(identifier, signature, msg) -> bool:
-    key = cryptonymToHex(identifier) if not isHex(
-        identifier) else identifier
-    ser = serializeForSig(msg)
+@lru_cache(maxsize=2048)
+def _idToKeyHex(identifier):
+    """
+    Returns the hex verification key for an identifier that is either a
+    cryptonym or already hex. Peers keep sending with the same few
+    identifiers, so the result is memoized.
+    """
+    return identifier if isHex(identifier) else cryptonymToHex(identifier)
+
+
+# Signatures already verified, keyed on the key, signature and a digest of
+# the serialized message so the cache does not hold on to the messages.
+# Shared with the worker threads verifying batches, hence the lock.
+_VERIFIED_SIGS_SIZE = 4096
+_verifiedSigs = OrderedDict()  # type: Dict[Tuple[str, str, bytes], bool]
+_verifiedSigsLock = Lock()
+
+
+def _verifySerialized(key, signature, ser) -> bool:
     b64sig = signature.encode('utf-8')
     sig = b64decode(b64sig)
     vr = Verifier(key)
     return vr.verify(sig, ser)
 
 
+def verifySig(identifier, signature, msg) -> bool:
+    return verifySigBytes(identifier, signature, serializeForSig(msg))
+
+
+def verifySigBytes(identifier, signature, ser: bytes) -> bool:
+    """
+    Like `verifySig` but takes the message already serialized with
+    `serializeForSig`, for callers that have the serialization at hand.
+    Results are memoized so a re-sent or replayed message does not pay for
+    the curve operations again.
+    """
+    key = _idToKeyHex(identifier)
+    cacheKey = (key, signature, sha256(ser).digest())
+    with _verifiedSigsLock:
+        verified = _verifiedSigs.get(cacheKey)
+        if verified is not None:
+            _verifiedSigs.move_to_end(cacheKey)
+            return verified
+    verified = _verifySerialized(key, signature, ser)
+    with _verifiedSigsLock:
+        _verifiedSigs[cacheKey] = verified
+        if len(_verifiedSigs) > _VERIFIED_SIGS_SIZE:
+            _verifiedSigs.popitem(last=False)
+    return verified
+
+
+def verifySigBatch(sigs: Sequence[Tuple[str, str, dict]]) -> List[bool]:
+    """
+    Verify several messages, e.g. on a worker thread, where serializing them
+    happens too. libnacl has no Ed25519 batch verification, so each
+    signature is checked on its own.
+
+    :param sigs: tuples of identifier, signature and message
+    :return: verification result for each tuple, in order
+    """
+    return [verifySig(identifier, signature, msg)
+            for identifier, signature, msg in sigs]
+
+
 def getSymmetricallyEncryptedVal(val, secretKey: Union[str, bytes]=None) -> \
         Tuple[str, str]:
     """
@@ -67,5 +67,15 @@ RAETLogFilePath = None
 RAETLogFilePathCli = None
 RAETMessageTimeout = 30
 
+'''
+When an agent receives at least `AgentVerifyInExecutorMinBatch` messages in
+one batch, their signatures are verified on a pool of `AgentVerifyWorkers`
+worker threads instead of on the event loop thread. Each worker task
+verifies up to `AgentVerifyInExecutorChunkSize` signatures.
+'''
+AgentVerifyInExecutorMinBatch = 64
+AgentVerifyInExecutorChunkSize = 32
+AgentVerifyWorkers = 4
+
 
 PluginsToLoad = ["anoncreds"]
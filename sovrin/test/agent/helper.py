@@ -1,3 +1,4 @@
+from plenum.common.exceptions import RemoteNotFound
 from plenum.test.eventually import eventually
 from plenum.test.helper import checkRemoteExists, CONNECTED
 from raet.road.estating import RemoteEstate
@@ -17,3 +18,62 @@ def ensureAgentsConnected(looper, agent1, agent2):
                           timeout=10))
     looper.run(eventually(checkRemoteExists, e2, e1.name, CONNECTED,
                           timeout=10))
+
+
+class FakeRemote:
+    def __init__(self, uid, name, ha):
+        self.uid = uid
+        self.name = name
+        self.ha = ha
+
+
+class FakeEndpoint:
+    """
+    Stands in for an agent's `Endpoint`, keeping remotes by uid like the
+    RAET stack does and recording what is transmitted
+    """
+    def __init__(self):
+        self.remotes = {}
+        self.lookups = 0
+        self.transmitted = []
+
+    def addRemote(self, remote):
+        self.remotes[remote.uid] = remote
+
+    def getRemote(self, name=None, ha=None):
+        self.lookups += 1
+        for remote in self.remotes.values():
+            if (name and remote.name == name) or (not name and remote.ha == ha):
+                return remote
+        raise RemoteNotFound(name or ha)
+
+    def transmit(self, msg, uid):
+        self.transmitted.append((msg, uid))
+
+    async def service(self, limit):
+        return 0
+
+
+class FakeClient:
+    """
+    Stands in for an agent's Sovrin client, recording submitted requests and
+    replying to them at once
+    """
+    def __init__(self):
+        self.submitted = []
+        self.observers = []
+
+    def hasObserver(self, observer):
+        return observer in self.observers
+
+    def registerObserver(self, observer):
+        self.observers.append(observer)
+
+    def submitReqs(self, *reqs):
+        self.submitted.append(reqs)
+
+    def replyIfConsensus(self, reqId):
+        return {"reqId": reqId}, None
+
+    async def prod(self, limit):
+        return 0
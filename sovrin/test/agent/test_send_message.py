@@ -0,0 +1,62 @@
+from sovrin.agent.agent import Agent
+from sovrin.test.agent.helper import FakeEndpoint, FakeRemote
+
+
+def agentWithEndpoint():
+    agent = Agent("sender", basedirpath=None)
+    agent.endpoint = FakeEndpoint()
+    return agent
+
+
+def testKnownHaResolvedOnce():
+    agent = agentWithEndpoint()
+    ha = ("127.0.0.1", 5555)
+    agent.endpoint.addRemote(FakeRemote(1, "faber", ha))
+    agent.sendMessage({}, destHa=ha)
+    agent.sendMessage({}, destHa=ha)
+    assert agent.endpoint.lookups == 1
+    assert [uid for _, uid in agent.endpoint.transmitted] == [1, 1]
+
+
+def testRemoteRejoiningWithNewUid():
+    agent = agentWithEndpoint()
+    ha = ("127.0.0.1", 5555)
+    agent.endpoint.addRemote(FakeRemote(1, "faber", ha))
+    agent.sendMessage({}, destHa=ha)
+    del agent.endpoint.remotes[1]
+    agent.endpoint.addRemote(FakeRemote(2, "faber", ha))
+    agent.sendMessage({}, destHa=ha)
+    assert agent.endpoint.transmitted[-1][1] == 2
+
+
+def testRenamedRemote():
+    agent = agentWithEndpoint()
+    faber = FakeRemote(1, "faber", ("127.0.0.1", 5555))
+    agent.endpoint.addRemote(faber)
+    agent.sendMessage({}, destName="faber")
+    faber.name = "acme"
+    agent.endpoint.addRemote(FakeRemote(2, "faber", ("127.0.0.1", 6666)))
+    agent.sendMessage({}, destName="faber")
+    assert agent.endpoint.transmitted[-1][1] == 2
+
+
+def testRemoteMovedToNewHa():
+    agent = agentWithEndpoint()
+    ha = ("127.0.0.1", 5555)
+    faber = FakeRemote(1, "faber", ha)
+    agent.endpoint.addRemote(faber)
+    agent.sendMessage({}, destHa=ha)
+    faber.ha = ("127.0.0.1", 7777)
+    agent.endpoint.addRemote(FakeRemote(2, "acme", ha))
+    agent.sendMessage({}, destHa=ha)
+    assert agent.endpoint.transmitted[-1][1] == 2
+
+
+def testRemovedRemoteNotSentTo():
+    agent = agentWithEndpoint()
+    ha = ("127.0.0.1", 5555)
+    agent.endpoint.addRemote(FakeRemote(1, "faber", ha))
+    agent.sendMessage({}, destHa=ha)
+    del agent.endpoint.remotes[1]
+    agent.sendMessage({}, destHa=ha)
+    assert len(agent.endpoint.transmitted) == 1
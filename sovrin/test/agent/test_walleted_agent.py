@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+from plenum.common.txn import TYPE, DATA, IDENTIFIER
+from plenum.common.types import f
+
+import sovrin.agent.agent as agentModule
+from sovrin.agent.agent import WalletedAgent, EVENT, EVENT_NAME, \
+    EVENT_NOTIFY_MSG
+from sovrin.client.wallet.link import Link
+from sovrin.client.wallet.wallet import Wallet
+from sovrin.common.util import verifySigBatch
+from sovrin.test.agent.helper import FakeClient, FakeEndpoint, FakeRemote
+
+
+class Observer:
+    def __init__(self):
+        self.notified = []
+
+    def notify(self, notifier, msg):
+        self.notified.append(msg)
+
+
+class BatchObserver(Observer):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def notifyBatch(self, notifier, msgs):
+        self.batches.append(msgs)
+
+
+@pytest.fixture
+def walletedAgent():
+    agent = WalletedAgent("Test Agent", basedirpath=None, client=FakeClient(),
+                          wallet=Wallet("TestAgent"))
+    agent.endpoint = FakeEndpoint()
+    return agent
+
+
+def testNotifyObserversBatch(walletedAgent):
+    plain, batched = Observer(), BatchObserver()
+    walletedAgent.registerObserver(plain)
+    walletedAgent.registerObserver(batched)
+    msgs = ["Response from Faber:", "    Signature accepted."]
+    walletedAgent.notifyObserversBatch(msgs)
+    assert plain.notified == msgs
+    assert batched.batches == [msgs]
+    assert not batched.notified
+
+
+def testDeregisterUnknownObserver(walletedAgent):
+    with pytest.raises(KeyError):
+        walletedAgent.deregisterObserver(Observer())
+
+
+class Req:
+    def __init__(self, reqId):
+        self.reqId = reqId
+
+
+def runProd(agent):
+    return agent.loop.run_until_complete(agent.prod(10))
+
+
+def testSovrinRequestSubmittedOnNextProd(walletedAgent):
+    client = walletedAgent.client
+    submittedBefore = list(client.submitted)
+    replies = []
+    req = Req(1)
+    walletedAgent._sendToSovrinAndDo(
+        req, clbk=lambda reply, err: replies.append(reply))
+    assert client.submitted == submittedBefore
+    assert not replies
+    runProd(walletedAgent)
+    assert client.submitted == submittedBefore + [(req, )]
+    assert replies == [{"reqId": 1}]
+
+
+def testQueuedSovrinRequestsSubmittedTogether(walletedAgent):
+    client = walletedAgent.client
+    reqs = [Req(1), Req(2)]
+    for req in reqs:
+        walletedAgent._sendToSovrinAndDo(req)
+    runProd(walletedAgent)
+    assert client.submitted[-1] == tuple(reqs)
+    runProd(walletedAgent)
+    assert client.submitted[-1] == tuple(reqs)
+
+
+def addLink(wallet, name, target):
+    li = Link(name, wallet.defaultId or "localIdentifier",
+              remoteIdentifier=target)
+    wallet.addLinkInvitation(li)
+    return li
+
+
+def testLinkByTargetAfterLinkReplaced(walletedAgent):
+    wallet = walletedAgent.wallet
+    first = addLink(wallet, "Faber", "faberIdr")
+    assert walletedAgent._getLinkByTarget("faberIdr") is first
+    second = addLink(wallet, "Faber", "faberIdr")
+    assert walletedAgent._getLinkByTarget("faberIdr") is second
+
+
+def testLinkByTargetAfterLinkRetargeted(walletedAgent):
+    wallet = walletedAgent.wallet
+    li = addLink(wallet, "Faber", "faberIdr")
+    assert walletedAgent._getLinkByTarget("faberIdr") is li
+    li.remoteIdentifier = "newFaberIdr"
+    assert walletedAgent._getLinkByTarget("faberIdr") is None
+    assert walletedAgent._getLinkByTarget("newFaberIdr") is li
+
+
+@pytest.fixture(scope="module")
+def senderWallet():
+    wallet = Wallet("Sender")
+    wallet.addSigner(seed=b'Sender00000000000000000000000000')
+    return wallet
+
+
+@pytest.fixture
+def verifyingInExecutor(walletedAgent, monkeypatch):
+    monkeypatch.setattr(walletedAgent.config,
+                        "AgentVerifyInExecutorMinBatch", 2)
+    monkeypatch.setattr(walletedAgent.config,
+                        "AgentVerifyInExecutorChunkSize", 1)
+    walletedAgent.endpoint.addRemote(
+        FakeRemote(1, "sender", ("127.0.0.1", 5555)))
+    observer = Observer()
+    walletedAgent.registerObserver(observer)
+    return walletedAgent, observer
+
+
+def receiveNotifications(agent, wallet, texts):
+    msgs = []
+    for text in texts:
+        msg = {
+            TYPE: EVENT,
+            EVENT_NAME: EVENT_NOTIFY_MSG,
+            DATA: text,
+            IDENTIFIER: wallet.defaultId
+        }
+        msg[f.SIG.nm] = wallet.signMsg(msg)
+        agent.handleEndpointMessage((msg, "sender"))
+        msgs.append(msg)
+    return msgs
+
+
+def testBatchVerifiedInExecutor(verifyingInExecutor, senderWallet,
+                                monkeypatch):
+    agent, observer = verifyingInExecutor
+    chunks = []
+
+    def verifyBatch(sigs):
+        chunks.append(len(sigs))
+        return verifySigBatch(sigs)
+
+    monkeypatch.setattr(agentModule, "verifySigBatch", verifyBatch)
+    msgs = receiveNotifications(agent, senderWallet, ["one", "two", "three"])
+    msgs[1][DATA] = "tampered"
+    runProd(agent)
+    assert agent._verifyExecutor is not None
+    assert chunks == [1, 1, 1]
+    assert observer.notified == ["one", "Signature rejected", "three"]
+    assert not agent._preVerified
+
+
+def testMsgsAfterFailingMsgNotLost(verifyingInExecutor, senderWallet):
+    agent, observer = verifyingInExecutor
+    agent.handleEndpointMessage(({TYPE: "UNKNOWN"}, "sender"))
+    receiveNotifications(agent, senderWallet, ["one"])
+    with pytest.raises(NotImplementedError):
+        runProd(agent)
+    assert len(agent._receivedMsgs) == 1
+    runProd(agent)
+    assert observer.notified == ["one"]
+    assert not agent._receivedMsgs
+
+
+def testStoppingDuringExecutorBatch(verifyingInExecutor, senderWallet):
+    agent, observer = verifyingInExecutor
+    receiveNotifications(agent, senderWallet, ["one", "two", "three"])
+
+    async def handleAndStop():
+        handling = asyncio.ensure_future(agent._handleReceivedMsgs())
+        # let the batch reach the executor before stopping
+        await asyncio.sleep(0)
+        assert agent._verifyExecutor is not None
+        agent.onStopping()
+        return await handling
+
+    assert agent.loop.run_until_complete(handleAndStop()) == 3
+    assert observer.notified == ["one", "two", "three"]
+    assert agent._verifyExecutor is None
@@ -0,0 +1,58 @@
+import pytest
+from plenum.common.signing import serializeForSig
+from plenum.common.txn import TYPE, NONCE
+from plenum.common.types import f
+
+from sovrin.common import util
+from sovrin.common.util import verifySig, verifySigBytes, \
+    verifySigBatch, _verifySerialized
+
+
+@pytest.fixture
+def signedMsg(stewardWallet):
+    msg = {
+        TYPE: "ACCEPT_INVITE",
+        f.IDENTIFIER.nm: stewardWallet.defaultId,
+        NONCE: "b1134a647eb818069c089e7694f63e6d",
+    }
+    msg[f.SIG.nm] = stewardWallet.signMsg(msg)
+    return msg
+
+
+def testVerifySigMatchesVerifySigBytes(stewardWallet, signedMsg):
+    idr, sig = stewardWallet.defaultId, signedMsg[f.SIG.nm]
+    assert verifySig(idr, sig, signedMsg)
+    assert verifySigBytes(idr, sig, serializeForSig(signedMsg))
+    assert verifySigBatch([(idr, sig, signedMsg)]) == [True]
+
+
+def testRepeatedVerificationIsCached(stewardWallet, signedMsg, monkeypatch):
+    idr, sig = stewardWallet.defaultId, signedMsg[f.SIG.nm]
+    assert verifySig(idr, sig, signedMsg)
+    verified = []
+
+    def verifySerialized(key, signature, ser):
+        verified.append(ser)
+        return _verifySerialized(key, signature, ser)
+
+    monkeypatch.setattr(util, "_verifySerialized", verifySerialized)
+    assert verifySig(idr, sig, signedMsg)
+    assert not verified
+    assert all(len(digest) == 32 for _, _, digest in util._verifiedSigs)
+
+
+def testTamperedPayloadRejectedAfterCaching(stewardWallet, signedMsg):
+    idr, sig = stewardWallet.defaultId, signedMsg[f.SIG.nm]
+    assert verifySig(idr, sig, signedMsg)
+    tampered = dict(signedMsg)
+    tampered[NONCE] = "2a2eb72eca8b404e8d412c5bf79f2640"
+    assert not verifySig(idr, sig, tampered)
+
+
+def testTamperedSignatureRejectedAfterCaching(stewardWallet, signedMsg):
+    idr, sig = stewardWallet.defaultId, signedMsg[f.SIG.nm]
+    assert verifySig(idr, sig, signedMsg)
+    other = dict(signedMsg)
+    other[NONCE] = "2a2eb72eca8b404e8d412c5bf79f2640"
+    otherSig = stewardWallet.signMsg(other)
+    assert not verifySig(idr, otherSig, signedMsg)